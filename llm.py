@@ -1,8 +1,14 @@
 import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import tempfile
+import pymupdf  # PyMuPDF, used directly for page-level extraction
 import pandas as pd
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS  # Corrected import
-from langchain_community.document_loaders import PyMuPDFLoader
 from langchain.text_splitter import CharacterTextSplitter
 from langchain.chains import RetrievalQA
 from langchain.schema import Document  # Import the correct Document schema from LangChain
@@ -20,6 +26,14 @@ llm = ChatOpenAI(openai_api_key=openai_api_key, model_name=model_name)
 
 vector_store = None
 
+# Directory holding the extracted PDF page text, one compressed file per PDF file hash
+pdf_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdf_cache")
+PDF_CACHE_VERSION = 2
+PDF_INDEX_NAME = "index.json.gz"
+# Tokens of a serialized PDF array or dict: strings are matched whole so that
+# text such as "(see 9 0 R)" is never mistaken for an object reference
+_PDF_TOKEN = re.compile(r"<<|>>|\((?:\\.|[^\\)])*\)|<[^>]*>|\b(\d+) \d+ R\b")
+
 ######################################################################
 
 def load_excel_file(file_path):
@@ -34,6 +48,214 @@ def load_word_file(file_path):
     doc = Doc(file_path)
     return "\n".join([para.text for para in doc.paragraphs])
 
+def _hash_file(file_path):
+    """Return the SHA-1 hex digest of a file's bytes."""
+    sha = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _hash_value(pdf, kind, value, memo):
+    """Return the digest text of a PDF value as returned by ``xref_get_key``."""
+    if kind == "xref":
+        return _hash_xref(pdf, int(value.split()[0]), memo)
+    if kind in ("array", "dict"):
+        # Inline containers come back serialized; replace the references they hold
+        return _PDF_TOKEN.sub(
+            lambda m: _hash_xref(pdf, int(m.group(1)), memo) if m.group(1) else m.group(0), value)
+    return f"{kind}:{value}"
+
+def _hash_xref(pdf, xref, memo):
+    """Return a content digest of a PDF object and everything it references.
+
+    References are replaced by the digest of the referenced object, so the
+    result does not depend on object numbering and stays the same when pages
+    are inserted or removed elsewhere in the file. Stream bytes are included,
+    which covers Form XObjects, font programs and ToUnicode CMaps, except for
+    images: they cannot change the extracted text and only their dictionary
+    is hashed.
+    """
+    if xref in memo:
+        return memo[xref]
+    memo[xref] = "cycle"  # Placeholder while this object is being walked
+    if pdf.xref_get_key(xref, "Type")[1] in ("/Page", "/Pages"):
+        # Never follow links back into the page tree, or every page would hash every other page
+        digest = "page"
+    else:
+        sha = hashlib.sha1()
+        for key in pdf.xref_get_keys(xref):
+            kind, value = pdf.xref_get_key(xref, key)
+            sha.update(f"/{key} {_hash_value(pdf, kind, value, memo)}\n".encode())
+        if pdf.xref_is_stream(xref) and pdf.xref_get_key(xref, "Subtype")[1] != "/Image":
+            sha.update(pdf.xref_stream_raw(xref))
+        digest = sha.hexdigest()
+    memo[xref] = digest
+    return digest
+
+def _page_resources(pdf, page):
+    """Return the page's /Resources entry, following inheritance from the page tree."""
+    xref = page.xref
+    while xref:
+        kind, value = pdf.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return kind, value
+        kind, parent = pdf.xref_get_key(xref, "Parent")
+        xref = int(parent.split()[0]) if kind == "xref" else 0
+    return "null", "null"
+
+def _hash_page(pdf, page, memo):
+    """Return a digest of everything on a page that can change its extracted text.
+
+    This covers the page geometry, its content streams and, recursively, every
+    object reachable from its resources (fonts with their CMaps and nested
+    Form XObjects). It does not cover document-level state such as optional
+    content (layer) visibility, so toggling a layer in the catalog does not
+    invalidate cached pages. Returns None if the page cannot be hashed.
+    """
+    try:
+        sha = hashlib.sha1(f"{page.rect}|{page.rotation}|".encode())
+        sha.update(page.read_contents())
+        sha.update(_hash_value(pdf, *_page_resources(pdf, page), memo).encode())
+        return sha.hexdigest()
+    except Exception as e:
+        # Hashing is only an optimization; the page is simply extracted again
+        logging.warning(f"Could not hash page {page.number} of {pdf.name}: {e}")
+        return None
+
+def _pdf_cache_path(file_hash):
+    """Return the cache file holding the pages of the PDF with the given hash."""
+    return os.path.join(pdf_cache_dir, file_hash + ".json.gz")
+
+def _read_cache_file(path):
+    """Read a gzip-compressed JSON cache file, returning None if it is missing or unreadable."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, EOFError, ValueError):
+        return None
+
+def _write_cache_file(path, data):
+    """Write a gzip-compressed JSON cache file atomically via a unique temporary file."""
+    os.makedirs(pdf_cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=pdf_cache_dir, suffix=".tmp", delete=False) as tmp:
+        try:
+            with gzip.GzipFile(fileobj=tmp, mode="wb") as gz:
+                gz.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    try:
+        os.replace(tmp.name, path)
+    except OSError:
+        os.remove(tmp.name)
+        raise
+
+def _read_pdf_cache(file_hash):
+    """Return the cached pages of a PDF as a list of {"hash", "text"} dicts, or None."""
+    cache = _read_cache_file(_pdf_cache_path(file_hash))
+    if not isinstance(cache, dict) or cache.get("version") != PDF_CACHE_VERSION:
+        return None
+    pages = cache.get("pages")
+    if not isinstance(pages, list) or not all(
+        isinstance(page, dict) and isinstance(page.get("hash"), str) and isinstance(page.get("text"), str)
+        for page in pages
+    ):
+        return None
+    return pages
+
+def _read_pdf_index():
+    """Return the {absolute path: {"hash", "stat"}} map of the last indexed version of each PDF."""
+    index = _read_cache_file(os.path.join(pdf_cache_dir, PDF_INDEX_NAME))
+    if not isinstance(index, dict) or index.get("version") != PDF_CACHE_VERSION:
+        return {}
+    files = index.get("files")
+    if not isinstance(files, dict):
+        return {}
+    return {
+        path: entry for path, entry in files.items()
+        if isinstance(entry, dict) and isinstance(entry.get("hash"), str) and isinstance(entry.get("stat"), list)
+    }
+
+def _update_pdf_cache(index, path_key, entry, pages=None):
+    """Store a PDF's pages, record it in the index and prune unreferenced cache files.
+
+    The cache is only an optimization, so a failure to write it is logged and
+    otherwise ignored.
+    """
+    try:
+        if pages is not None:
+            _write_cache_file(_pdf_cache_path(entry["hash"]),
+                              {"version": PDF_CACHE_VERSION, "pages": pages})
+
+        # Forget PDFs that no longer exist, then drop page caches nothing points to
+        files = {path: e for path, e in index.items() if os.path.exists(path)}
+        files[path_key] = entry
+        _write_cache_file(os.path.join(pdf_cache_dir, PDF_INDEX_NAME),
+                          {"version": PDF_CACHE_VERSION, "files": files})
+        referenced = {e["hash"] for e in files.values()}
+        for name in os.listdir(pdf_cache_dir):
+            if name.endswith(".json.gz") and name != PDF_INDEX_NAME and name[:-len(".json.gz")] not in referenced:
+                os.remove(os.path.join(pdf_cache_dir, name))
+    except OSError as e:
+        logging.warning(f"Could not update PDF cache in {pdf_cache_dir}: {e}")
+
+def load_pdf_pages(file_path):
+    """Return the text of each page of a PDF, using the on-disk page cache.
+
+    Cached pages are stored per file hash, so an unchanged PDF is served
+    entirely from the cache wherever it lives. The file is only re-hashed when
+    its size or modification time differs from the last time it was seen at
+    this path. When a PDF changes, its pages are matched by content hash
+    against the previous version at the same path, and only pages that are
+    new or modified are re-extracted.
+    """
+    path_key = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    fingerprint = [stat.st_size, stat.st_mtime_ns]
+    index = _read_pdf_index()
+    previous = index.get(path_key)
+
+    if previous and previous["stat"] == fingerprint:
+        file_hash = previous["hash"]
+    else:
+        file_hash = _hash_file(file_path)
+    entry = {"hash": file_hash, "stat": fingerprint}
+
+    cached_pages = _read_pdf_cache(file_hash)
+    if cached_pages is not None:
+        if previous != entry:
+            _update_pdf_cache(index, path_key, entry)
+        return [page["text"] for page in cached_pages]
+
+    previous_pages = _read_pdf_cache(previous["hash"]) if previous else None
+    known_texts = {page["hash"]: page["text"] for page in previous_pages or [] if page["hash"]}
+
+    pages = []
+    memo = {}
+    with pymupdf.open(file_path) as pdf:
+        for page in pdf:
+            page_hash = _hash_page(pdf, page, memo)
+            text = known_texts.get(page_hash) if page_hash else None
+            if text is None:
+                text = page.get_text()  # Plain text layer only, no OCR
+            pages.append({"hash": page_hash or "", "text": text})
+
+    _update_pdf_cache(index, path_key, entry, pages)
+    return [page["text"] for page in pages]
+
+def load_pdf_file(file_path, filename):
+    """Load a PDF as one Document per page, keeping the page number in metadata."""
+    texts = load_pdf_pages(file_path)
+    return [
+        Document(
+            page_content=text,
+            metadata={"source": filename, "page": page_number, "total_pages": len(texts)},
+        )
+        for page_number, text in enumerate(texts)
+    ]
+
 # Function to load and process PDF, Word, and Excel files and create FAISS index
 def load_and_index_documents(folder_path):
     global vector_store
@@ -47,11 +269,7 @@ def load_and_index_documents(folder_path):
 
         # Handle PDF files
         if filename.endswith(".pdf"):
-            loader = PyMuPDFLoader(file_path)
-            docs = loader.load()
-            for doc in docs:
-                doc.metadata = {"source": filename}  # Attach the filename to the document metadata
-                documents.append(doc)  # Add each PDF page as a document object
+            documents.extend(load_pdf_file(file_path, filename))  # Add each PDF page as a document object
             found_valid_file = True  # Mark that we found a valid file
 
         # Handle Word files
@@ -107,10 +325,7 @@ def evaluate_context_token_count(folder_path, token_limit):
 
         # Handle PDF files
         if filename.endswith(".pdf"):
-            loader = PyMuPDFLoader(file_path)
-            docs = loader.load()
-            for doc in docs:
-                documents.append(doc)  # Add each PDF page as a document object
+            documents.extend(load_pdf_file(file_path, filename))  # Add each PDF page as a document object
             found_valid_file = True  # Mark that we found a valid file
 
         # Handle Word files
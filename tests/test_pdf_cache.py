@@ -0,0 +1,194 @@
+import gzip
+import os
+import sys
+import types
+
+import pymupdf
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# llm.py reads the local settings module and builds its client at import time
+sys.modules.setdefault("settings", types.SimpleNamespace(model_name="gpt-4"))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+import llm  # noqa: E402
+
+
+def make_pdf(path, page_texts):
+    pdf = pymupdf.open()
+    for text in page_texts:
+        page = pdf.new_page()
+        page.insert_text((72, 72), text)
+    pdf.save(path)
+    pdf.close()
+
+
+@pytest.fixture
+def extracted(monkeypatch, tmp_path):
+    """Point the cache at a temporary folder and record the text of every extracted page."""
+    monkeypatch.setattr(llm, "pdf_cache_dir", str(tmp_path / "cache"))
+    calls = []
+    get_text = pymupdf.Page.get_text
+
+    def counting_get_text(page, *args, **kwargs):
+        text = get_text(page, *args, **kwargs)
+        calls.append(text.strip())
+        return text
+
+    monkeypatch.setattr(pymupdf.Page, "get_text", counting_get_text)
+    return calls
+
+
+def test_unchanged_pdf_is_served_from_cache(tmp_path, extracted):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one", "two", "three"])
+
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one", "two", "three"]
+    assert len(extracted) == 3
+
+    extracted.clear()
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one", "two", "three"]
+    assert extracted == []
+
+
+def test_only_changed_pages_are_reextracted(tmp_path, extracted):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one", "two", "three", "four"])
+    llm.load_pdf_pages(path)
+
+    extracted.clear()
+    make_pdf(path, ["inserted", "one", "TWO!", "three", "four"])
+    texts = llm.load_pdf_pages(path)
+
+    assert [t.strip() for t in texts] == ["inserted", "one", "TWO!", "three", "four"]
+    assert sorted(extracted) == ["TWO!", "inserted"]
+
+
+def test_moved_pdf_reuses_cache(tmp_path, extracted):
+    first = str(tmp_path / "first.pdf")
+    make_pdf(first, ["one", "two"])
+    llm.load_pdf_pages(first)
+
+    extracted.clear()
+    second = str(tmp_path / "second.pdf")
+    os.replace(first, second)
+    llm.load_pdf_pages(second)
+    assert extracted == []
+
+
+def test_unchanged_pdf_is_not_rehashed(tmp_path, extracted, monkeypatch):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one"])
+    llm.load_pdf_pages(path)
+
+    def failing_hash(path):
+        raise AssertionError("file was hashed again")
+
+    monkeypatch.setattr(llm, "_hash_file", failing_hash)
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one"]
+
+
+def test_malformed_cache_is_a_miss(tmp_path, extracted):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one"])
+    cache_path = llm._pdf_cache_path(llm._hash_file(path))
+    llm._write_cache_file(cache_path, {"pages": [{"text": 1}]})
+
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one"]
+    assert extracted == ["one"]
+
+    # A cache file cut short by a crash or a full disk is also a miss
+    with open(cache_path, "rb") as f:
+        data = f.read()
+    with open(cache_path, "wb") as f:
+        f.write(data[:len(data) // 2])
+    os.remove(os.path.join(llm.pdf_cache_dir, llm.PDF_INDEX_NAME))
+    with pytest.raises(EOFError):
+        with gzip.open(cache_path) as f:
+            f.read()
+
+    extracted.clear()
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one"]
+    assert extracted == ["one"]
+
+
+def test_reference_text_inside_strings_is_ignored(tmp_path, extracted):
+    path = str(tmp_path / "doc.pdf")
+    pdf = pymupdf.open()
+    page = pdf.new_page()
+    page.insert_text((72, 72), "one")
+    note = pdf.get_new_xref()
+    pdf.update_object(note, "<</Note (see 9999 0 R) /Items [(1 0 R) <</A (2 0 R)>>]>>")
+    resources = int(pdf.xref_get_key(page.xref, "Resources")[1].split()[0])
+    pdf.xref_set_key(resources, "Properties", f"<</MC0 {note} 0 R>>")
+    pdf.save(path)
+    pdf.close()
+
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one"]
+
+    memo = {}
+    with pymupdf.open(path) as pdf:
+        assert llm._hash_page(pdf, pdf[0], memo) is not None
+    assert note in memo and 9999 not in memo
+
+
+def test_unhashable_page_is_extracted(tmp_path, extracted, monkeypatch):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one", "two"])
+
+    def failing_resources(pdf, page):
+        raise ValueError("bad xref")
+
+    monkeypatch.setattr(llm, "_page_resources", failing_resources)
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one", "two"]
+
+
+def test_cache_write_failure_does_not_break_loading(tmp_path, extracted, monkeypatch):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one"])
+
+    def failing_write(path, data):
+        raise PermissionError("read-only")
+
+    monkeypatch.setattr(llm, "_write_cache_file", failing_write)
+    assert [t.strip() for t in llm.load_pdf_pages(path)] == ["one"]
+
+
+def test_pdf_metadata_keeps_page_numbers(tmp_path, extracted):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one", "two"])
+
+    docs = llm.load_pdf_file(path, "doc.pdf")
+    assert [doc.metadata for doc in docs] == [
+        {"source": "doc.pdf", "page": 0, "total_pages": 2},
+        {"source": "doc.pdf", "page": 1, "total_pages": 2},
+    ]
+
+
+def test_form_xobject_change_is_reextracted(tmp_path, extracted):
+    def make_stamped_pdf(path, stamp_text):
+        stamp = pymupdf.open()
+        stamp.new_page().insert_text((72, 72), stamp_text)
+        pdf = pymupdf.open()
+        page = pdf.new_page()
+        page.show_pdf_page(page.rect, stamp, 0)  # Draws the stamp as a Form XObject
+        pdf.save(path)
+        pdf.close()
+        stamp.close()
+
+    path = str(tmp_path / "doc.pdf")
+    make_stamped_pdf(path, "before")
+    assert llm.load_pdf_pages(path)[0].strip() == "before"
+
+    make_stamped_pdf(path, "after")
+    assert llm.load_pdf_pages(path)[0].strip() == "after"
+
+
+def test_replaced_versions_are_pruned(tmp_path, extracted):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, ["one"])
+    llm.load_pdf_pages(path)
+    make_pdf(path, ["three"])
+    llm.load_pdf_pages(path)
+
+    cached = sorted(os.listdir(llm.pdf_cache_dir))
+    assert cached == sorted([llm.PDF_INDEX_NAME, llm._hash_file(path) + ".json.gz"])